@@ -7,22 +7,113 @@ This script filters security advisories based on keyword matching,
 regex patterns, and severity thresholds.
 """
 
-import json
+import heapq
+import os
 import sys
 import re
 import yaml
-from typing import List, Dict, Any, Set
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from operator import itemgetter
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
 from pathlib import Path
 
+from json_utils import load_json_file, dump_json
+
+# Pattern syntax whose meaning changes when lowercased: uppercase escapes
+# (\S, \W, \U...), character codes (\x41, \u0041, \N{...}, octal \101),
+# inline flag groups that can turn off IGNORECASE ((?-i:...)) and character
+# ranges whose endpoints differ in case ([A-z])
+CASE_SENSITIVE_ESCAPE = re.compile(r'\\(?:[A-Z]|[xuN0-7])')
+INLINE_FLAG_OFF = re.compile(r'\(\?[a-zA-Z]*-')
+CHARACTER_RANGE = re.compile(r'(?=([^\\])-([^\\\]]))')
+
+# ijson streams large advisory arrays instead of loading them at once
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _intern_name(name: Any) -> Any:
+    """Intern a configured name, leaving non-string YAML scalars unchanged."""
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+class AdvisoryLoadError(Exception):
+    """Raised when the advisories file cannot be read or parsed."""
+
+
+def iter_advisories(path: str) -> Iterable[Dict[str, Any]]:
+    """Read advisories from a file holding a JSON array or a single advisory.
+    
+    With ijson installed the advisories are streamed one at a time; otherwise
+    the whole file is parsed into a list. Read and parse failures, including
+    those hit midway through a stream, raise AdvisoryLoadError.
+    """
+    if ijson is not None:
+        return _stream_advisories(path)
+    
+    try:
+        advisories = load_json_file(path)
+    except Exception as e:
+        raise AdvisoryLoadError(e) from e
+    # Support both array and single advisory
+    return advisories if isinstance(advisories, list) else [advisories]
+
+
+def _stream_advisories(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield advisories from a JSON file as ijson parses them."""
+    try:
+        with open(path, 'rb') as f:
+            # Support both array and single advisory
+            first = f.read(1)
+            while first.isspace():
+                first = f.read(1)
+            f.seek(0)
+            prefix = 'item' if first == b'[' else ''
+            yield from ijson.items(f, prefix, use_float=True)
+    except Exception as e:
+        raise AdvisoryLoadError(e) from e
+
 
 class AdvisoryFilter:
     """Filter security advisories based on configuration."""
     
+    # Smaller batches are filtered in-process; starting workers costs more than it saves
+    PARALLEL_MIN_ADVISORIES = 1000
+    
+    # Advisories handed to a worker at a time when filtering in parallel
+    PARALLEL_CHUNK_SIZE = 250
+    
+    # Default ranking weights, overridden by ranking.weights in the configuration
+    DEFAULT_WEIGHTS = {
+        'exact_match': 10,
+        'category_match': 5,
+        'regex_match': 7,
+        'severity_critical': 15,
+        'severity_high': 10,
+        'severity_medium': 5
+    }
+    
     def __init__(self, config_path: str):
         """Initialize the filter with configuration."""
         self.config = self._load_config(config_path)
         self.keywords = self._extract_keywords()
+        # Names are used as result keys for every matching advisory; intern
+        # them so equal names from the YAML share one string object (YAML may
+        # also give numbers, e.g. a 101: key or name: 2024, which are kept as-is)
+        self.category_names = {
+            category_id: _intern_name(category_data.get('name', category_id))
+            for category_id, category_data in self.config.get('categories', {}).items()
+        }
+        self.keyword_matcher = self._build_keyword_matcher()
         self.regex_patterns = self._compile_regex_patterns()
+        self._load_severity()
+        self._load_ranking()
+        # Advisories seen by the last filter_advisories run
+        self.processed_count = 0
         
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load filter configuration from YAML file."""
@@ -55,6 +146,110 @@ class AdvisoryFilter:
         
         return keywords
     
+    def _build_keyword_matcher(self) -> Optional[Dict[str, Any]]:
+        """Build a single matcher covering the keywords of every category."""
+        # Map each keyword to every category it belongs to
+        keyword_categories = {}
+        for category_id, category_keywords in self.keywords.items():
+            for keyword in category_keywords:
+                # Blank entries normalize to '' and would match everywhere
+                if keyword:
+                    keyword_categories.setdefault(keyword, []).append(category_id)
+        
+        if not keyword_categories:
+            return None
+        
+        # Whole-word keywords share one boundary-anchored alternation; keywords
+        # with special characters (dots, hyphens, spaces) match as substrings
+        alnum_keywords = []
+        special_keywords = []
+        for keyword in keyword_categories:
+            if re.match(r'^[\w]+$', keyword):
+                alnum_keywords.append(keyword)
+            else:
+                special_keywords.append(keyword)
+        
+        # Shorter special keywords starting at the same position as a hit are
+        # prefixes of it, so each hit expands to itself plus its keyword prefixes
+        special_candidates = {
+            keyword: (keyword,) + tuple(other for other in special_keywords
+                                        if other != keyword and keyword.startswith(other))
+            for keyword in special_keywords
+        }
+        
+        category_order = {category_id: index for index, category_id in enumerate(self.keywords)}
+        
+        return {
+            'alnum_pattern': self._compile_alternation(alnum_keywords, r'\b(', r')\b'),
+            'special_pattern': self._compile_alternation(special_keywords, '', ''),
+            'special_candidates': special_candidates,
+            # Frozen per-keyword lookups; nothing keyword-specific is rebuilt per advisory
+            'categories': {keyword: tuple(category_ids)
+                           for keyword, category_ids in keyword_categories.items()},
+            'category_order': category_order
+        }
+    
+    @staticmethod
+    def _trie_regex(keywords: List[str]) -> str:
+        """Build a regex alternation of keywords factored by their common prefixes."""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            # Empty key marks the end of a keyword
+            node[''] = {}
+        
+        def build(node: Dict[str, Any]) -> str:
+            branches = [re.escape(char) + build(child)
+                        for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            if len(branches) == 1:
+                body = branches[0]
+            else:
+                body = '(?:' + '|'.join(branches) + ')'
+            if '' in node:
+                # Greedy optional tail: the longest keyword is tried first
+                return body + '?' if len(branches) > 1 else '(?:' + body + ')?'
+            return body
+        
+        return build(trie)
+    
+    def _compile_alternation(self, keywords: List[str], prefix: str, suffix: str) -> Optional[re.Pattern]:
+        """Compile keywords into one trie-shaped alternation so shared prefixes are scanned once."""
+        if not keywords:
+            return None
+        return re.compile(prefix + self._trie_regex(keywords) + suffix)
+    
+    def _load_severity(self):
+        """Resolve the severity threshold once so checks need no config lookups."""
+        severity_config = self.config.get('severity', {})
+        
+        self.severity_enabled = severity_config.get('enabled', True)
+        self.min_cvss = float(severity_config.get('min_cvss', 0.0))
+        self.allowed_levels = frozenset(
+            sys.intern(level.lower())
+            for level in severity_config.get('levels', ['critical', 'high', 'medium', 'low'])
+        )
+    
+    def _load_ranking(self):
+        """Resolve ranking settings once so scoring needs no config lookups."""
+        ranking_config = self.config.get('ranking', {})
+        weights = {**self.DEFAULT_WEIGHTS, **ranking_config.get('weights', {})}
+        
+        self.ranking_enabled = ranking_config.get('enabled', True)
+        # None (max_results: null) means no limit, as with the previous slicing
+        self.max_results = ranking_config.get('max_results', 20)
+        self.weight_exact_match = weights['exact_match']
+        self.weight_category_match = weights['category_match']
+        self.weight_regex_match = weights['regex_match']
+        self.severity_weights = {
+            'critical': weights['severity_critical'],
+            'high': weights['severity_high'],
+            'medium': weights['severity_medium']
+        }
+    
     def _compile_regex_patterns(self) -> List[Dict[str, Any]]:
         """Compile regex patterns from configuration."""
         patterns = []
@@ -63,13 +258,24 @@ class AdvisoryFilter:
         if not regex_config.get('enabled', True):
             return patterns
         
+        # Patterns match case-insensitively unless the configuration (or the
+        # pattern's own case_sensitive flag) opts out
+        ignore_case = regex_config.get('ignore_case', True)
+        
         for pattern_config in regex_config.get('patterns', []):
             try:
-                compiled = re.compile(pattern_config['pattern'], re.IGNORECASE)
+                case_sensitive = pattern_config.get('case_sensitive', not ignore_case)
+                compiled, match_lowercase = self._compile_pattern(pattern_config['pattern'],
+                                                                  not case_sensitive)
                 patterns.append({
                     'pattern': compiled,
-                    'description': pattern_config.get('description', ''),
-                    'original': pattern_config['pattern']
+                    'match_lowercase': match_lowercase,
+                    # Match details reported for every advisory this pattern hits;
+                    # all results share this one dict, so it must not be modified
+                    'match_info': {
+                        'description': pattern_config.get('description', ''),
+                        'pattern': pattern_config['pattern']
+                    }
                 })
             except re.error as e:
                 print(f"✗ Invalid regex pattern: {pattern_config['pattern']} - {e}", 
@@ -78,90 +284,113 @@ class AdvisoryFilter:
         print(f"✓ Compiled {len(patterns)} regex patterns", file=sys.stderr)
         return patterns
     
+    @staticmethod
+    def _compile_pattern(pattern: str, ignore_case: bool) -> Tuple[re.Pattern, bool]:
+        """Compile a configured pattern and report whether it matches lowercased text.
+        
+        Case-insensitive patterns run against the lowercased advisory text. When
+        lowercasing the pattern cannot change its meaning, it is compiled
+        lowercased without re.IGNORECASE, which matches faster than case folding
+        every character. Anything doubtful keeps re.IGNORECASE and runs against
+        the original text, since a (?-i:...) group cannot match lowercased text.
+        """
+        if not ignore_case:
+            return re.compile(pattern), False
+        
+        compiled = re.compile(pattern, re.IGNORECASE)
+        if (CASE_SENSITIVE_ESCAPE.search(pattern) or INLINE_FLAG_OFF.search(pattern)
+                or any((low != low.lower()) != (high != high.lower())
+                       for low, high in CHARACTER_RANGE.findall(pattern))):
+            return compiled, False
+        try:
+            return re.compile(pattern.lower()), True
+        except re.error:
+            # e.g. a character range that is only valid in its original case
+            return compiled, False
+    
     def _check_severity(self, advisory: Dict[str, Any]) -> bool:
         """Check if advisory meets severity threshold."""
-        severity_config = self.config.get('severity', {})
-        
-        if not severity_config.get('enabled', True):
+        if not self.severity_enabled:
             return True
         
-        min_cvss = severity_config.get('min_cvss', 0.0)
-        allowed_levels = severity_config.get('levels', ['critical', 'high', 'medium', 'low'])
-        
         # Check CVSS score
         cvss_score = advisory.get('cvssScore', 0.0)
-        if cvss_score < min_cvss:
+        if cvss_score < self.min_cvss:
             return False
         
         # Check severity level
         severity = advisory.get('severity', '').lower()
-        if severity and severity not in [level.lower() for level in allowed_levels]:
+        if severity and severity not in self.allowed_levels:
             return False
         
         return True
     
-    def _match_keywords(self, text: str, category_id: str) -> List[str]:
-        """Match keywords using flexible matching for special characters."""
-        matched = []
-        category_keywords = self.keywords.get(category_id, set())
-        text_lower = text.lower()
-        
-        for keyword in category_keywords:
-            # Use word boundary matching for alphanumeric keywords
-            # For keywords with special chars (dots, hyphens, spaces), use simple substring matching
-            if re.match(r'^[\w]+$', keyword):
-                # Pure alphanumeric - use word boundaries
-                pattern = r'\b' + re.escape(keyword) + r'\b'
-                if re.search(pattern, text_lower, re.IGNORECASE):
-                    matched.append(keyword)
-            else:
-                # Contains special characters - use substring matching
-                if keyword in text_lower:
-                    matched.append(keyword)
-        
-        return matched
+    def _match_keywords(self, text_lower: str) -> Dict[str, List[str]]:
+        """Match keywords of all categories with one precompiled scan per keyword kind.
+        
+        Keywords are normalized to lowercase, so the text must already be lowercased.
+        """
+        matched = {}
+        if self.keyword_matcher is None:
+            return matched
+        
+        found = []
+        
+        # Whole words cannot overlap, so a plain scan finds every alphanumeric keyword
+        alnum_pattern = self.keyword_matcher['alnum_pattern']
+        if alnum_pattern is not None:
+            found.extend(alnum_pattern.findall(text_lower))
+        
+        # Substring hits may overlap, so resume one character past each hit's start.
+        # A plain pattern (unlike a zero-width lookahead) lets the regex engine
+        # skip ahead to positions whose first character can start a keyword.
+        special_pattern = self.keyword_matcher['special_pattern']
+        if special_pattern is not None:
+            special_candidates = self.keyword_matcher['special_candidates']
+            match = special_pattern.search(text_lower)
+            while match is not None:
+                found.extend(special_candidates[match.group()])
+                if match.start() >= len(text_lower):
+                    break
+                match = special_pattern.search(text_lower, match.start() + 1)
+        
+        # Group hits by category, keeping the configuration order of categories
+        for keyword in dict.fromkeys(found):
+            for category_id in self.keyword_matcher['categories'][keyword]:
+                matched.setdefault(category_id, []).append(keyword)
+        
+        category_order = self.keyword_matcher['category_order']
+        return {category_id: matched[category_id]
+                for category_id in sorted(matched, key=category_order.get)}
     
-    def _match_regex_patterns(self, text: str) -> List[Dict[str, str]]:
-        """Match regex patterns against text."""
-        matched = []
-        
-        for pattern_info in self.regex_patterns:
-            if pattern_info['pattern'].search(text):
-                matched.append({
-                    'description': pattern_info['description'],
-                    'pattern': pattern_info['original']
-                })
-        
-        return matched
+    def _match_regex_patterns(self, text: str, text_lower: str) -> List[Dict[str, str]]:
+        """Match regex patterns against the original or lowercased text.
+        
+        The returned records are shared by every result hitting the same pattern;
+        callers must copy them before making changes.
+        """
+        return [pattern_info['match_info'] for pattern_info in self.regex_patterns
+                if pattern_info['pattern'].search(text_lower if pattern_info['match_lowercase'] else text)]
     
-    def _calculate_relevance_score(self, matches: Dict[str, Any], advisory: Dict[str, Any]) -> int:
+    def _calculate_relevance_score(self, matches: Dict[str, Any], advisory: Dict[str, Any],
+                                   total_keyword_matches: int) -> int:
         """Calculate relevance score for ranking."""
-        ranking_config = self.config.get('ranking', {})
-        
-        if not ranking_config.get('enabled', True):
+        if not self.ranking_enabled:
             return 1
         
-        weights = ranking_config.get('weights', {})
         score = 0
         
         # Add points for keyword matches
-        total_keyword_matches = sum(len(keywords) for keywords in matches['matched_keywords'].values())
-        score += total_keyword_matches * weights.get('exact_match', 10)
+        score += total_keyword_matches * self.weight_exact_match
         
         # Add points for category matches
-        score += len(matches['matched_categories']) * weights.get('category_match', 5)
+        score += len(matches['matched_categories']) * self.weight_category_match
         
         # Add points for regex matches
-        score += len(matches['matched_patterns']) * weights.get('regex_match', 7)
+        score += len(matches['matched_patterns']) * self.weight_regex_match
         
         # Add points based on severity
-        severity = advisory.get('severity', '').lower()
-        if severity == 'critical':
-            score += weights.get('severity_critical', 15)
-        elif severity == 'high':
-            score += weights.get('severity_high', 10)
-        elif severity == 'medium':
-            score += weights.get('severity_medium', 5)
+        score += self.severity_weights.get(advisory.get('severity', '').lower(), 0)
         
         return score
     
@@ -171,29 +400,41 @@ class AdvisoryFilter:
         if not self._check_severity(advisory):
             return None
         
-        # Combine searchable text from advisory
-        searchable_text = ' '.join([
+        # Nothing can match without keywords or patterns; skip building the text
+        if self.keyword_matcher is None and not self.regex_patterns:
+            return None
+        
+        # Combine searchable text from advisory in a single join; references are
+        # appended as parts rather than joined into an intermediate string
+        parts = [
             advisory.get('id', ''),
             advisory.get('description', ''),
             advisory.get('summary', ''),
-            advisory.get('title', ''),
-            ' '.join(advisory.get('references', []))
-        ])
+            advisory.get('title', '')
+        ]
+        parts.extend(advisory.get('references') or [''])
+        searchable_text = ' '.join(parts)
+        
+        # Lowercase once; keyword matching works on normalized text
+        text_lower = searchable_text.lower()
         
         # Match keywords across all categories
         matched_keywords = {}
+        # Kept apart from matched_keywords: categories may share a name, and each
+        # matching category still earns its own category bonus
         matched_categories = []
+        total_keyword_matches = 0
         
-        for category_id, category_data in self.config.get('categories', {}).items():
-            category_name = category_data.get('name', category_id)
-            keywords = self._match_keywords(searchable_text, category_id)
-            
-            if keywords:
-                matched_keywords[category_name] = keywords
-                matched_categories.append(category_name)
+        for category_id, keywords in self._match_keywords(text_lower).items():
+            category_name = self.category_names[category_id]
+            # A category sharing an earlier one's name replaces its keywords, so
+            # only the replacement's keywords stay in the count
+            total_keyword_matches += len(keywords) - len(matched_keywords.get(category_name, ()))
+            matched_keywords[category_name] = keywords
+            matched_categories.append(category_name)
         
         # Match regex patterns
-        matched_patterns = self._match_regex_patterns(searchable_text)
+        matched_patterns = self._match_regex_patterns(searchable_text, text_lower)
         
         # If no matches found, skip this advisory
         if not matched_keywords and not matched_patterns:
@@ -206,7 +447,7 @@ class AdvisoryFilter:
             'matched_patterns': matched_patterns
         }
         
-        relevance_score = self._calculate_relevance_score(matches, advisory)
+        relevance_score = self._calculate_relevance_score(matches, advisory, total_keyword_matches)
         
         return {
             'advisory': advisory,
@@ -214,29 +455,85 @@ class AdvisoryFilter:
             'relevance_score': relevance_score
         }
     
-    def filter_advisories(self, advisories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Filter multiple advisories and return ranked results."""
-        filtered = []
-        
-        print(f"Processing {len(advisories)} advisories...", file=sys.stderr)
-        
-        for advisory in advisories:
-            result = self.filter_advisory(advisory)
+    def _filter_batch(self, advisories: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Filter advisories in order, across worker processes for large inputs.
+        
+        The input is read chunk by chunk, so streamed advisories are never held in
+        memory all at once; only a bounded number of chunks is in flight.
+        """
+        advisories = iter(advisories)
+        head = list(islice(advisories, self.PARALLEL_MIN_ADVISORIES))
+        workers = os.cpu_count() or 1
+        if workers < 2 or len(head) < self.PARALLEL_MIN_ADVISORIES:
+            yield from map(self.filter_advisory, chain(head, advisories))
+            return
+        
+        remaining = chain(head, advisories)
+        chunks = iter(lambda: list(islice(remaining, self.PARALLEL_CHUNK_SIZE)), [])
+        
+        # Each worker receives the filter once instead of once per chunk
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_filter_chunk_in_worker, chunk))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    
+    def _count_relevant(self, results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield matching results, counting every advisory processed in processed_count."""
+        for result in results:
+            self.processed_count += 1
             if result:
-                filtered.append(result)
-        
-        # Sort by relevance score (highest first)
-        filtered.sort(key=lambda x: x['relevance_score'], reverse=True)
-        
-        # Limit results based on configuration
-        max_results = self.config.get('ranking', {}).get('max_results', 20)
-        filtered = filtered[:max_results]
+                yield result
+    
+    def filter_advisories(self, advisories: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Filter multiple advisories and return ranked results.
+        
+        Lists and streamed advisories are both filtered as they are read, in
+        worker processes once the input proves large. The number of advisories
+        seen is stored in processed_count once the results are returned.
+        """
+        if isinstance(advisories, list):
+            print(f"Processing {len(advisories)} advisories...", file=sys.stderr)
+        else:
+            print("Processing streamed advisories...", file=sys.stderr)
+        results = self._filter_batch(advisories)
+        
+        # Keep the highest relevance scores, limited by configuration. nlargest
+        # holds only the current top results and keeps input order for equal scores.
+        self.processed_count = 0
+        relevant = self._count_relevant(results)
+        if self.max_results is None or self.max_results <= 0:
+            # nlargest would not read its input for a limit of 0 or less, leaving
+            # advisories unfiltered and uncounted; rank everything and slice instead
+            # (a null limit keeps every result)
+            filtered = sorted(relevant, key=itemgetter('relevance_score'), reverse=True)[:self.max_results]
+        else:
+            filtered = heapq.nlargest(self.max_results, relevant, key=itemgetter('relevance_score'))
         
         print(f"✓ Filtered to {len(filtered)} relevant advisories", file=sys.stderr)
         
         return filtered
 
 
+# Filter instance used by worker processes, set once per worker by _init_worker
+_worker_filter = None
+
+
+def _init_worker(advisory_filter: AdvisoryFilter):
+    """Store the filter in a worker process."""
+    global _worker_filter
+    _worker_filter = advisory_filter
+
+
+def _filter_chunk_in_worker(advisories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Filter a chunk of advisories inside a worker process."""
+    return [_worker_filter.filter_advisory(advisory) for advisory in advisories]
+
+
 def main():
     """Main entry point for the script."""
     if len(sys.argv) < 3:
@@ -246,28 +543,21 @@ def main():
     config_file = sys.argv[1]
     advisories_file = sys.argv[2]
     
-    # Load advisories
+    # Create filter and process advisories as they are loaded
+    filter_engine = AdvisoryFilter(config_file)
     try:
-        with open(advisories_file, 'r') as f:
-            advisories = json.load(f)
-        
-        # Support both array and single advisory
-        if not isinstance(advisories, list):
-            advisories = [advisories]
-        
-        print(f"✓ Loaded {len(advisories)} advisories from {advisories_file}", file=sys.stderr)
-    except Exception as e:
+        filtered_results = filter_engine.filter_advisories(iter_advisories(advisories_file))
+    except AdvisoryLoadError as e:
         print(f"✗ Error loading advisories: {e}", file=sys.stderr)
         sys.exit(1)
     
-    # Create filter and process advisories
-    filter_engine = AdvisoryFilter(config_file)
-    filtered_results = filter_engine.filter_advisories(advisories)
+    total_advisories = filter_engine.processed_count
+    print(f"✓ Processed {total_advisories} advisories from {advisories_file}", file=sys.stderr)
     
     # Output results as JSON
-    filter_efficiency = (len(filtered_results) / len(advisories) * 100) if len(advisories) > 0 else 0.0
+    filter_efficiency = (len(filtered_results) / total_advisories * 100) if total_advisories > 0 else 0.0
     output = {
-        'total_advisories': len(advisories),
+        'total_advisories': total_advisories,
         'filtered_advisories': len(filtered_results),
         'results': filtered_results,
         'statistics': {
@@ -278,7 +568,7 @@ def main():
     }
     
     # Print to stdout for consumption by GitHub Actions
-    print(json.dumps(output, indent=2))
+    print(dump_json(output))
 
 
 if __name__ == '__main__':
@@ -7,11 +7,18 @@ This script formats filtered advisories into readable markdown notifications
 for Teams and Slack.
 """
 
-import json
+import io
+import re
 import sys
+from collections import Counter
 from typing import List, Dict, Any
 from datetime import datetime
 
+from json_utils import load_json_file, dump_json
+
+# Leading YYYY-MM-DD of an ISO 8601 timestamp
+ISO_DATE_PREFIX = re.compile(r'\d{4}-\d{2}-\d{2}')
+
 
 class NotificationGenerator:
     """Generate formatted notifications from filtered advisories."""
@@ -25,6 +32,16 @@ class NotificationGenerator:
         'unknown': '⚪'
     }
     
+    # Emojis keyed by severity exactly as it appears in advisories (lower, UPPER
+    # and Capitalized), so the common cases need no normalization per lookup
+    SEVERITY_EMOJI_LOOKUP = {
+        **{variant: emoji
+           for level, emoji in SEVERITY_EMOJIS.items()
+           for variant in (level, level.upper(), level.capitalize())},
+        '': SEVERITY_EMOJIS['unknown'],
+        None: SEVERITY_EMOJIS['unknown']
+    }
+    
     # Description truncation settings
     MAX_DESCRIPTION_LENGTH = 300
     TRUNCATION_SUFFIX = '...'
@@ -33,11 +50,14 @@ class NotificationGenerator:
     
     def _get_severity_emoji(self, severity: str) -> str:
         """Get emoji for severity level."""
-        severity_lower = severity.lower() if severity else 'unknown'
-        return self.SEVERITY_EMOJIS.get(severity_lower, self.SEVERITY_EMOJIS['unknown'])
+        emoji = self.SEVERITY_EMOJI_LOOKUP.get(severity)
+        if emoji is None:
+            # Unusual casing or unknown level
+            emoji = self.SEVERITY_EMOJIS.get(severity.lower(), self.SEVERITY_EMOJIS['unknown'])
+        return emoji
     
-    def _format_advisory_summary(self, result: Dict[str, Any], rank: int) -> str:
-        """Format a single advisory as a markdown section."""
+    def _format_advisory_summary(self, result: Dict[str, Any], rank: int, buf: io.StringIO) -> None:
+        """Write a single advisory as a markdown section to buf."""
         advisory = result['advisory']
         matches = result['matches']
         relevance_score = result['relevance_score']
@@ -49,8 +69,11 @@ class NotificationGenerator:
         url = advisory.get('url', '')
         published = advisory.get('publishedDate', '')
         
-        # Format published date
-        if published:
+        # Format published date; ISO timestamps already start with it
+        date_match = ISO_DATE_PREFIX.match(published) if published else None
+        if date_match:
+            published_str = date_match.group()
+        elif published:
             try:
                 dt = datetime.fromisoformat(published.replace('Z', '+00:00'))
                 published_str = dt.strftime('%Y-%m-%d')
@@ -62,24 +85,21 @@ class NotificationGenerator:
         # Get emoji for severity
         emoji = self._get_severity_emoji(severity)
         
-        # Build the markdown
-        md = []
-        md.append(f"### {rank}. {emoji} {cve_id} - {severity.upper()} ({cvss_score})")
-        md.append("")
-        md.append(f"**Published:** {published_str} | **Relevance Score:** {relevance_score}")
-        md.append("")
-        
         # Description (truncate if too long)
         if len(description) > self.MAX_DESCRIPTION_LENGTH:
             description = description[:self.MAX_DESCRIPTION_LENGTH - len(self.TRUNCATION_SUFFIX)] + self.TRUNCATION_SUFFIX
-        md.append(f"**Description:** {description}")
-        md.append("")
+        
+        # Write the markdown, one write per section
+        buf.write(
+            f"### {rank}. {emoji} {cve_id} - {severity.upper()} ({cvss_score})\n\n"
+            f"**Published:** {published_str} | **Relevance Score:** {relevance_score}\n\n"
+            f"**Description:** {description}\n\n"
+        )
         
         # Matched categories
         if matches['matched_categories']:
             categories_str = ', '.join(matches['matched_categories'])
-            md.append(f"**Matched Categories:** {categories_str}")
-            md.append("")
+            buf.write(f"**Matched Categories:** {categories_str}\n\n")
         
         # Matched keywords (show first 10)
         all_keywords = []
@@ -91,24 +111,18 @@ class NotificationGenerator:
             keywords_str = ', '.join([f"`{kw}`" for kw in keywords_display])
             if len(all_keywords) > 10:
                 keywords_str += f" ... (+{len(all_keywords) - 10} more)"
-            md.append(f"**Matched Keywords:** {keywords_str}")
-            md.append("")
+            buf.write(f"**Matched Keywords:** {keywords_str}\n\n")
         
         # Matched patterns
         if matches['matched_patterns']:
             patterns_str = ', '.join([p['description'] for p in matches['matched_patterns']])
-            md.append(f"**Matched Patterns:** {patterns_str}")
-            md.append("")
+            buf.write(f"**Matched Patterns:** {patterns_str}\n\n")
         
         # Link
         if url:
-            md.append(f"**Link:** [{cve_id}]({url})")
-        
-        md.append("")
-        md.append("---")
-        md.append("")
+            buf.write(f"**Link:** [{cve_id}]({url})\n")
         
-        return '\n'.join(md)
+        buf.write("\n---\n\n")
     
     def generate_markdown(self, filtered_data: Dict[str, Any]) -> str:
         """Generate complete markdown notification."""
@@ -117,66 +131,64 @@ class NotificationGenerator:
         filtered = filtered_data.get('filtered_advisories', 0)
         stats = filtered_data.get('statistics', {})
         
-        md = []
+        # All sections are written to one buffer and rendered once at the end
+        buf = io.StringIO()
         
         # Header
-        md.append("# 🔒 Security Advisory Notification")
-        md.append("")
-        md.append("**Navisite LLC & Accenture LLC Vulnerability Management**")
-        md.append("")
-        md.append(f"**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}")
-        md.append("")
+        buf.write(
+            "# 🔒 Security Advisory Notification\n\n"
+            "**Navisite LLC & Accenture LLC Vulnerability Management**\n\n"
+            f"**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}\n\n"
+        )
         
         # Statistics
-        md.append("## 📊 Filter Statistics")
-        md.append("")
-        md.append(f"- **Total Advisories Scanned:** {total}")
-        md.append(f"- **Relevant Advisories Found:** {filtered}")
-        md.append(f"- **Filter Efficiency:** {stats.get('filter_efficiency', 'N/A')}")
-        md.append(f"- **Categories Used:** {stats.get('categories_used', 0)}")
-        md.append(f"- **Regex Patterns Used:** {stats.get('regex_patterns_used', 0)}")
-        md.append("")
+        buf.write(
+            "## 📊 Filter Statistics\n\n"
+            f"- **Total Advisories Scanned:** {total}\n"
+            f"- **Relevant Advisories Found:** {filtered}\n"
+            f"- **Filter Efficiency:** {stats.get('filter_efficiency', 'N/A')}\n"
+            f"- **Categories Used:** {stats.get('categories_used', 0)}\n"
+            f"- **Regex Patterns Used:** {stats.get('regex_patterns_used', 0)}\n\n"
+        )
         
         if not results:
-            md.append("## ✅ No Relevant Vulnerabilities")
-            md.append("")
-            md.append("No vulnerabilities matching your technology stack were found in this scan.")
-            md.append("")
-            return '\n'.join(md)
-        
-        # Severity breakdown
-        severity_counts = {}
-        for result in results:
-            severity = result['advisory'].get('severity', 'UNKNOWN').lower()
-            severity_counts[severity] = severity_counts.get(severity, 0) + 1
-        
-        md.append("## 🎯 Severity Breakdown")
-        md.append("")
+            buf.write(
+                "## ✅ No Relevant Vulnerabilities\n\n"
+                "No vulnerabilities matching your technology stack were found in this scan.\n"
+            )
+            return buf.getvalue()
+        
+        # Severity breakdown; raw values are counted first so each distinct
+        # spelling is lowercased once rather than once per advisory
+        raw_counts = Counter(result['advisory'].get('severity', 'UNKNOWN') for result in results)
+        severity_counts = Counter()
+        for severity, count in raw_counts.items():
+            severity_counts[severity.lower()] += count
+        
+        buf.write("## 🎯 Severity Breakdown\n\n")
         for severity in ['critical', 'high', 'medium', 'low']:
-            if severity in severity_counts:
+            count = severity_counts[severity]
+            if count:
                 emoji = self._get_severity_emoji(severity)
-                count = severity_counts[severity]
-                md.append(f"- {emoji} **{severity.upper()}:** {count}")
-        md.append("")
+                buf.write(f"- {emoji} **{severity.upper()}:** {count}\n")
         
         # Advisories
-        md.append("## 🚨 Relevant Security Advisories")
-        md.append("")
+        buf.write("\n## 🚨 Relevant Security Advisories\n\n")
         
         for idx, result in enumerate(results, 1):
-            md.append(self._format_advisory_summary(result, idx))
+            self._format_advisory_summary(result, idx, buf)
         
         # Footer
-        md.append("---")
-        md.append("")
-        md.append("*This notification was automatically generated by the Vulnerability Advisory Automation System.*")
-        md.append("")
+        buf.write(
+            "---\n\n"
+            "*This notification was automatically generated by the Vulnerability Advisory Automation System.*\n"
+        )
         
-        return '\n'.join(md)
+        return buf.getvalue()
     
     def generate_json(self, filtered_data: Dict[str, Any]) -> str:
         """Generate JSON output for programmatic consumption."""
-        return json.dumps(filtered_data, indent=2)
+        return dump_json(filtered_data)
     
     def generate_teams_payload(self, filtered_data: Dict[str, Any]) -> str:
         """Generate Microsoft Teams webhook payload (Adaptive Card)."""
@@ -306,7 +318,7 @@ class NotificationGenerator:
             ]
         }
         
-        return json.dumps(card, indent=2)
+        return dump_json(card)
     
     def generate_slack_payload(self, filtered_data: Dict[str, Any]) -> str:
         """Generate Slack webhook payload."""
@@ -385,7 +397,7 @@ class NotificationGenerator:
             "blocks": blocks
         }
         
-        return json.dumps(payload, indent=2)
+        return dump_json(payload)
 
 
 def main():
@@ -400,8 +412,7 @@ def main():
     
     # Load filtered results
     try:
-        with open(results_file, 'r') as f:
-            filtered_data = json.load(f)
+        filtered_data = load_json_file(results_file)
         print(f"✓ Loaded filtered results from {results_file}", file=sys.stderr)
     except Exception as e:
         print(f"✗ Error loading results: {e}", file=sys.stderr)
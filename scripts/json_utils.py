@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+JSON Helpers for the Advisory Scripts
+For Navisite LLC and Accenture LLC SOC and Vulnerability Management Teams
+
+Shared by the filtering and notification scripts to read and write JSON,
+using orjson when it is installed.
+"""
+
+import json
+from typing import Any
+
+# orjson parses and serializes much faster; fall back to the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_json_file(path: str) -> Any:
+    """Parse a JSON file, using orjson when available."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dump_json(data: Any) -> str:
+    """Serialize data as indented JSON, using orjson when available."""
+    if orjson is not None:
+        # Category names used as keys may be YAML numbers; convert them like json does
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    # Match orjson's output, which keeps non-ASCII characters as-is
+    return json.dumps(data, indent=2, ensure_ascii=False)